@@ -8,6 +8,29 @@ import Foundation
 import CoreML
 
 class KeyboardAIModel {
+    // Loaded once per extension process: iOS creates a new
+    // KeyboardViewController every time the keyboard is shown.
+    // Only a successful load is cached, so a failed one (e.g. under
+    // memory pressure) is retried by the next caller
+    private static var loadedShared: KeyboardAIModel?
+    private static let sharedLock = NSLock()
+    
+    static var shared: KeyboardAIModel? {
+        sharedLock.lock()
+        defer { sharedLock.unlock() }
+        
+        if let model = loadedShared {
+            return model
+        }
+        loadedShared = KeyboardAIModel()
+        return loadedShared
+    }
+    
+    // Context cap per prediction. The model accepts up to 512 tokens;
+    // 50 trailing words is enough for next-word suggestions and keeps
+    // per-keystroke latency low
+    private static let maxContextTokens = 50
+    
     private let model: KeyboardAI
     private let tokenizer: Tokenizer
     private let vocabSize: Int
@@ -40,60 +63,88 @@ class KeyboardAIModel {
         }
         self.tokenizer = tokenizer
         
-        // Read vocab size from metadata
-        if let infoPath = Bundle.main.path(forResource: "model_info", ofType: "json"),
-           let data = try? Data(contentsOf: URL(fileURLWithPath: infoPath)),
-           let json = try? JSONSerialization.jsonObject(with: data) as? [String: Any],
-           let vocab = json["vocab_size"] as? Int {
-            self.vocabSize = vocab
-        } else {
-            self.vocabSize = 100 // Default
-        }
+        // Vocab size comes from the tokenizer already in memory
+        // (matches "vocab_size" in model_info.json, no second file read)
+        self.vocabSize = tokenizer.vocabSize
+        
+        // Warm up: the first prediction pays for Core ML's one-off model
+        // preparation. Do it here (off the main thread, see
+        // KeyboardViewController) instead of on the user's first keystroke
+        _ = predict(text: "hi", topK: 1)
     }
     
     func predict(text: String, topK: Int = 5) -> [String] {
-        // Tokenize input
-        let tokenIds = tokenizer.encode(text)
-        guard !tokenIds.isEmpty else { return [] }
-        
-        // Take last 50 tokens (model's max sequence length)
-        let input = Array(tokenIds.suffix(50))
+        // Tokenize input: only the trailing context window
+        let input = tokenizer.encode(text, maxTokens: Self.maxContextTokens)
+        guard !input.isEmpty, topK > 0 else { return [] }
         
-        // Pad to fixed length if needed
-        var paddedInput = input
-        while paddedInput.count < 50 {
-            paddedInput.insert(0, at: 0) // Pad with 0
-        }
-        
-        // Convert to MLMultiArray
-        guard let inputArray = try? MLMultiArray(shape: [1, 50], dataType: .int32) else {
+        // The model input is flexible (1...512 tokens), so run on the real
+        // tokens only: no padding, and no compute spent on pad positions
+        guard let inputArray = try? MLMultiArray(shape: [1, NSNumber(value: input.count)], dataType: .int32) else {
             return []
         }
         
-        for (i, tokenId) in paddedInput.enumerated() {
-            inputArray[i] = NSNumber(value: tokenId)
+        // Write ids straight into the int32 buffer instead of boxing each
+        // one in an NSNumber
+        let written = inputArray.withUnsafeMutableBufferPointer(ofType: Int32.self) { ids, strides -> Bool in
+            let tokenStride = strides[strides.count - 1]
+            guard (input.count - 1) * tokenStride < ids.count else {
+                return false
+            }
+            
+            for (i, tokenId) in input.enumerated() {
+                ids[i * tokenStride] = Int32(tokenId)
+            }
+            return true
         }
+        guard written else { return [] }
         
         // Run inference
         guard let output = try? model.prediction(input_ids: inputArray) else {
             return []
         }
         
-        // Get logits from output
+        // Get logits from output (float32, [1, seq, vocab])
         let logits = output.logits
+        guard logits.dataType == .float32, logits.shape.count >= 2 else {
+            return []
+        }
         
-        // Extract last token's predictions
-        let lastTokenStart = (paddedInput.count - 1) * vocabSize
-        var scores: [(index: Int, score: Float)] = []
+        // Only the last position matters for next-word suggestions: read
+        // that row straight from the buffer via strides instead of boxing
+        // every element in an NSNumber
+        let strides = logits.strides.map { $0.intValue }
+        let positionStride = strides[strides.count - 2]
+        let vocabStride = strides[strides.count - 1]
+        let lastTokenStart = (input.count - 1) * positionStride
+        let vocabCount = min(vocabSize, logits.shape[logits.shape.count - 1].intValue)
         
-        for i in 0..<vocabSize {
-            let score = logits[lastTokenStart + i].floatValue
-            scores.append((index: i, score: score))
+        let topScores = logits.withUnsafeBufferPointer(ofType: Float.self) { scores -> [(index: Int, score: Float)] in
+            guard vocabCount > 0,
+                  lastTokenStart + (vocabCount - 1) * vocabStride < scores.count else {
+                return []
+            }
+            
+            // Keep only the best topK while scanning
+            // (no vocab-sized scores array, no full sort)
+            var best: [(index: Int, score: Float)] = []
+            best.reserveCapacity(topK + 1)
+            
+            for i in 0..<vocabCount {
+                let score = scores[lastTokenStart + i * vocabStride]
+                if best.count == topK && score <= best[topK - 1].score {
+                    continue
+                }
+                
+                let position = best.firstIndex { score > $0.score } ?? best.count
+                best.insert((index: i, score: score), at: position)
+                if best.count > topK {
+                    best.removeLast()
+                }
+            }
+            return best
         }
         
-        // Get top-K
-        let topScores = scores.sorted { $0.score > $1.score }.prefix(topK)
-        
         // Convert to words
         return topScores.map { tokenizer.decode([$0.index]) }
     }
@@ -46,7 +46,7 @@ class KeyboardViewController: UIInputViewController {
         super.viewDidLoad()
         // Load model (lazy loading for better performance)
         DispatchQueue.global(qos: .userInitiated).async { [weak self] in
-            self?.model = KeyboardAIModel()
+            self?.model = KeyboardAIModel.shared
             if self?.model == nil {
                 print("Failed to initialize model")
             }
@@ -626,16 +626,18 @@ extension KeyboardViewController {
         DispatchQueue.global(qos: .userInteractive).async { [weak self] in
             let suggestions = model.predict(text: text, topK: 3)
             
-            // Cache result
-            self?.predictionCache[text] = suggestions
-            
-            // Limit cache size
-            if self?.predictionCache.count ?? 0 > 100 {
-                self?.predictionCache.removeAll()
-            }
-            
             DispatchQueue.main.async {
+                // Cache result (on main, where it is read)
+                self?.predictionCache[text] = suggestions
+                
+                // Limit cache size
+                if self?.predictionCache.count ?? 0 > 100 {
+                    self?.predictionCache.removeAll()
+                }
+                
+                #if DEBUG
                 print("\(#function) suggestions: \(suggestions)")
+                #endif
                 self?.displaySuggestions(suggestions)
             }
         }
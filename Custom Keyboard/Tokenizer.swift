@@ -9,48 +9,74 @@ import Foundation
 
 class Tokenizer {
     private var vocabMap: [String: Int] = [:]
-    private var reverseVocabMap: [Int: String] = [:]
+    private var reverseVocab: [String] = [] // Token id -> token, contiguous
     let vocabSize: Int
     
     init?() {
         // Load vocabulary
-        guard let vocabPath = Bundle.main.path(forResource: "tokenizer", ofType: "vocab") else {
+        guard let vocabURL = Bundle.main.url(forResource: "tokenizer", withExtension: "vocab") else {
             print("Tokenizer vocab not found")
             return nil
         }
         
         do {
-            let vocabContent = try String(contentsOfFile: vocabPath, encoding: .utf8)
-            let lines = vocabContent.components(separatedBy: .newlines)
-            
-            for (index, line) in lines.enumerated() {
-                let parts = line.components(separatedBy: "\t")
-                if parts.count >= 1 {
-                    let token = parts[0]
-                    vocabMap[token] = index
-                    reverseVocabMap[index] = token
+            // Map the file and scan raw bytes: only the token before the
+            // tab is decoded, the score column never becomes a String
+            let data = try Data(contentsOf: vocabURL, options: .alwaysMapped)
+            let (vocab, tokens) = data.withUnsafeBytes { buffer -> ([String: Int], [String]) in
+                var vocab: [String: Int] = [:]
+                var tokens: [String] = []
+                
+                var lines = buffer.split(separator: UInt8(ascii: "\n"), omittingEmptySubsequences: false)
+                if lines.last?.isEmpty == true {
+                    lines.removeLast() // Trailing newline, not a token
+                }
+                
+                vocab.reserveCapacity(lines.count)
+                tokens.reserveCapacity(lines.count)
+                
+                for (index, line) in lines.enumerated() {
+                    var token = line.prefix { $0 != UInt8(ascii: "\t") }
+                    if token.last == UInt8(ascii: "\r") {
+                        token = token.dropLast()
+                    }
+                    let word = String(decoding: token, as: UTF8.self)
+                    vocab[word] = index
+                    tokens.append(word)
                 }
+                return (vocab, tokens)
+            }
+            
+            guard !tokens.isEmpty else {
+                print("Tokenizer vocab is empty")
+                return nil
             }
             
-            vocabSize = vocabMap.count
+            vocabMap = vocab
+            reverseVocab = tokens
+            vocabSize = tokens.count // Ids are line numbers
         } catch {
             print("Error loading vocab: \(error)")
             return nil
         }
     }
     
-    func encode(_ text: String) -> [Int] {
+    func encode(_ text: String, maxTokens: Int = .max) -> [Int] {
         // Simplified tokenization
         // In production, use SentencePiece library or implement BPE
-        let words = text.lowercased().components(separatedBy: .whitespaces)
-        return words.compactMap { word in
+        // split() yields Substrings (no String copy per word) and skips
+        // the empty words that repeated or trailing spaces would produce.
+        // Only the last maxTokens words are lowercased and hashed.
+        let words = text.split(whereSeparator: \.isWhitespace).suffix(maxTokens)
+        return words.map { word in
             // Simple hash-based encoding (replace with proper SentencePiece)
-            abs(word.hashValue % vocabSize)
+            abs(word.lowercased().hashValue % vocabSize)
         }
     }
     
     func decode(_ ids: [Int]) -> String {
         // Simplified decoding
-        return ids.compactMap { reverseVocabMap[$0] }.joined(separator: " ")
+        return ids.compactMap { reverseVocab.indices.contains($0) ? reverseVocab[$0] : nil }
+            .joined(separator: " ")
     }
 }